@@ -2,7 +2,7 @@ import os
 import sys
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QLineEdit, QPushButton, QListWidget, QRadioButton,
-                             QButtonGroup, QFileDialog, QMessageBox, QCheckBox)
+                             QButtonGroup, QFileDialog, QMessageBox, QCheckBox, QProgressBar)
 from controller import WorkerThread
 
 
@@ -152,10 +152,28 @@ class VideoTranscriberGUI(QWidget):
         self.current_action_label = QLabel("")
         layout.addWidget(self.current_action_label)
 
+        # Per-file progress and throughput stats
+        self.file_progress_bar = QProgressBar()
+        self.file_progress_bar.setRange(0, 100)
+        self.file_progress_bar.setValue(0)
+        layout.addWidget(self.file_progress_bar)
+        self.stats_label = QLabel("")
+        layout.addWidget(self.stats_label)
+
         # Checkbox for "No Newline"
         self.no_newline_checkbox = QCheckBox("No newline")
         layout.addWidget(self.no_newline_checkbox)
 
+        # Checkbox for keeping the model loaded between sessions
+        self.warm_daemon_checkbox = QCheckBox("Keep model loaded (background daemon)")
+        layout.addWidget(self.warm_daemon_checkbox)
+
+        # Checkboxes for streaming URLs straight into transcription
+        self.stream_checkbox = QCheckBox("Stream (transcribe while downloading)")
+        layout.addWidget(self.stream_checkbox)
+        self.keep_media_checkbox = QCheckBox("Keep streamed media")
+        layout.addWidget(self.keep_media_checkbox)
+
         # Start Button
         self.start_button = QPushButton("Start Process")
         layout.addWidget(self.start_button)
@@ -173,6 +191,7 @@ class VideoTranscriberGUI(QWidget):
         # Connect mode selection signals to update UI
         self.download_radio.toggled.connect(self.update_ui_for_mode)
         self.download_transcribe_radio.toggled.connect(self.update_ui_for_mode)
+        self.stream_checkbox.toggled.connect(self.update_ui_for_mode)
 
         # Initialize UI state
         self.update_ui_for_mode()
@@ -203,6 +222,10 @@ class VideoTranscriberGUI(QWidget):
         self.single_media_input.setEnabled(single_file_enabled)
         self.browse_single_media_button.setEnabled(single_file_enabled)
 
+        # Streaming only applies when transcribing, keeping media only when streaming
+        self.stream_checkbox.setEnabled(single_file_enabled)
+        self.keep_media_checkbox.setEnabled(single_file_enabled and self.stream_checkbox.isChecked())
+
 
     def browse_url_file(self):
         """Open a file dialog to select a URL file."""
@@ -269,6 +292,22 @@ class VideoTranscriberGUI(QWidget):
         """Update the current action label."""
         self.current_action_label.setText(text)
 
+    def update_progress(self, stats):
+        """Update the progress bar and throughput stats from a worker progress signal."""
+        self.file_progress_bar.setValue(int(stats.get('percent') or 0))
+
+        rtf = stats.get('rtf')
+        rtf_text = f"{rtf:.2f}" if rtf is not None else "-"
+        speed = stats.get('download_speed') or 0.0
+        queue_depth = stats.get('queue_depth')
+        queue_text = str(queue_depth) if queue_depth is not None else "unknown"
+        self.stats_label.setText(
+            f"Real-time factor: {rtf_text}   "
+            f"Download: {speed / (1024 * 1024):.2f} MB/s   "
+            f"Queue: {queue_text}   "
+            f"Worker utilization: {stats.get('utilization', 0.0) * 100:.0f}%"
+        )
+
     def start_process(self):
         """Start the video processing based on the selected mode."""
         if not self.video_list and not self.local_file_list:
@@ -277,14 +316,19 @@ class VideoTranscriberGUI(QWidget):
             self.update_action_label("Starting process...")
             self.start_button.setEnabled(False)
             self.worker = WorkerThread(self.video_list, self.local_file_list, self.output_path,
-                                       self.download_radio.isChecked(), self.no_newline_checkbox.isChecked())
+                                       self.download_radio.isChecked(), self.no_newline_checkbox.isChecked(),
+                                       self.warm_daemon_checkbox.isChecked(), self.stream_checkbox.isChecked(),
+                                       self.stream_checkbox.isChecked() and self.keep_media_checkbox.isChecked())
             self.worker.update_label.connect(self.update_action_label)
+            self.worker.progress.connect(self.update_progress)
             self.worker.process_finished.connect(self.on_process_finished)
             self.worker.start()
 
     def on_process_finished(self):
         """Called when the process is finished."""
         self.update_action_label("Process finished!")
+        self.file_progress_bar.setValue(0)
+        self.stats_label.setText("")
         self.video_list.clear()
         self.local_file_list.clear()
         self.video_list_box.clear()
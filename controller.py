@@ -3,7 +3,9 @@ from pathlib import Path
 import time
 import torch
 from PyQt5.QtCore import QThread, pyqtSignal
-from downloader import download_media
+from downloader import iter_entries, iter_media, media_title
+from streamer import stream_transcribe
+import transcription_daemon
 import subprocess
 import re
 from docx import Document
@@ -50,10 +52,102 @@ def replace_newlines(text):
 def remove_newlines(text):
     return re.sub(r'[\r\n]+', ' ', text)
 
+# Whisper prints one line per decoded segment, e.g. "[01:02.000 --> 01:05.500]  Hello"
+SEGMENT_RE = re.compile(r'^\[((?:\d+:)?\d+:\d+\.\d+) --> ((?:\d+:)?\d+:\d+\.\d+)\]')
+
+def parse_timestamp(timestamp):
+    """
+    Converts a Whisper timestamp ("MM:SS.mmm" or "HH:MM:SS.mmm") to seconds.
+    """
+    seconds = 0.0
+    for part in timestamp.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_segment_end(line):
+    """
+    Returns the end time in seconds of the segment printed on the given line,
+    or None if the line is not a segment line.
+    """
+    match = SEGMENT_RE.match(line.strip())
+    if match is None:
+        return None
+    return parse_timestamp(match.group(2))
+
+def probe_duration(media_path):
+    """
+    Returns the duration of a media file in seconds using ffprobe, or None if it is unknown.
+    """
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(media_path)],
+            capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
 class WorkerThread(QThread):
     update_label = pyqtSignal(str)
+    progress = pyqtSignal(dict)
     process_finished = pyqtSignal()
 
+    # Minimum number of seconds between two progress signals
+    PROGRESS_INTERVAL = 0.25
+
+    def emit_progress(self, force=False, **fields):
+        """
+        Updates the progress stats and emits them, at most once every PROGRESS_INTERVAL
+        seconds unless force is set, so long batches do not flood the GUI event loop.
+        """
+        self.stats.update(fields)
+        now = time.monotonic()
+        if not force and now - self.last_progress < self.PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+
+        elapsed = now - self.started_at
+        busy = self.busy_seconds
+        if self.transcribe_started is not None:
+            busy += now - self.transcribe_started
+        self.stats['utilization'] = busy / elapsed if elapsed > 0 else 0.0
+        if self.pending_entries is None:
+            # A lazy listing is still running and the site did not report its length
+            self.stats['queue_depth'] = None
+        else:
+            self.stats['queue_depth'] = self.pending_local + self.pending_entries + self.pending_urls
+        self.progress.emit(dict(self.stats))
+
+    def download_hook(self, d):
+        """yt-dlp progress hook, reports the current download speed."""
+        if d.get('status') == 'downloading':
+            self.emit_progress(download_speed=d.get('speed') or 0.0)
+        elif d.get('status') == 'finished':
+            self.emit_progress(force=True, download_speed=0.0)
+
+    def entry_hook(self, remaining):
+        """Called before every playlist video with the number of videos still queued after it."""
+        self.pending_entries = remaining
+
+    def bytes_hook(self, total):
+        """Reports the throughput of a stream from the total number of bytes received so far."""
+        now = time.monotonic()
+        if self.bytes_sample is not None:
+            last_time, last_total = self.bytes_sample
+            if now > last_time:
+                self.emit_progress(download_speed=(total - last_total) / (now - last_time))
+        self.bytes_sample = (now, total)
+
+    def url_routine(self, handle_url):
+        """Calls handle_url for every queued URL, keeping the queue depth up to date."""
+        urls = list(self.url_list)
+        for i, url in enumerate(urls):
+            self.pending_urls = len(urls) - i - 1
+            self.pending_entries = None
+            handle_url(url)
+        self.pending_urls = 0
+        self.pending_entries = 0
+
     def word_routine(self, video_title, duration, output_dir):
         """
         Creates a Word document with the video title, transcription duration,
@@ -93,47 +187,174 @@ class WorkerThread(QThread):
         word_filename = os.path.join(output_dir, f"{video_title}.docx")
         doc.save(word_filename)
 
-    def download_routine(self):
-        for url in self.url_list:
+    def download_routine(self, on_downloaded=None):
+        """
+        Downloads every queued URL. Playlists are streamed entry by entry, and each file
+        is handed to on_downloaded as soon as it is on disk.
+        """
+        def download_url(url):
             try:
                 self.update_label.emit(f"Downloading {url}...")
-                self.downloaded_list += download_media(url, self.output_folder)
+                for path in iter_media(url, self.output_folder, progress_hook=self.download_hook,
+                                       entry_hook=self.entry_hook):
+                    self.downloaded_list.append(path)
+                    if on_downloaded is not None:
+                        try:
+                            on_downloaded(path)
+                        except Exception as e:
+                            # A single broken entry should not abort the rest of the playlist
+                            print(f"Failed to process {path}: {e}")
+                        self.update_label.emit(f"Downloading {url}...")
                 self.url_list.remove(url)  # Remove URL after processing
             except Exception as e:
                 print(f"Failed to download media from {url}: {e}")
 
-    def transcribe_routine(self):
+        self.url_routine(download_url)
 
+    def select_device(self):
         if torch.cuda.is_available():
             self.device = "cuda"
         else:
             self.device = "cpu"
 
-        merge_list = self.local_list + self.downloaded_list
-        path_list = []
-        for f in merge_list:
-            path_list.append(Path(f))
-
-        for p in path_list:
-            # Get the video title
-            video_title = os.path.splitext(os.path.basename(p))[0]
-            output_dir = create_transcription_directory(p)
-            self.update_label.emit(f"Transcribing {video_title}...")
-            # Record the start time
-            start_time = time.time()
-            subprocess.run(["whisper", p, "--model", "turbo", "--device", self.device,"--output_dir", output_dir])
-            # Record the end time
-            end_time = time.time()
-            # Calculate the duration
-            duration = end_time - start_time
-            # Create a Word file using the word_routine function
-            self.word_routine(video_title, duration, output_dir)
-
-    def __init__(self, url_list, local_list, output_folder, mode, noNewLine):
+    def handle_whisper_line(self, line, media_duration):
+        """Echoes a line of Whisper output and turns segment lines into progress signals."""
+        print(line, end='')
+        segment_end = parse_segment_end(line)
+        if segment_end is None:
+            return
+        # Measured from the first segment so model loading does not count as decoding time
+        now = time.monotonic()
+        fields = {}
+        if self.rtf_baseline is None:
+            self.rtf_baseline = (now, segment_end)
+        else:
+            first_time, first_end = self.rtf_baseline
+            if segment_end > first_end:
+                fields['rtf'] = (now - first_time) / (segment_end - first_end)
+        if media_duration:
+            fields['percent'] = min(100.0, segment_end / media_duration * 100)
+        self.emit_progress(**fields)
+
+    def run_whisper(self, p, output_dir, on_line):
+        """Transcribes a file with the whisper command line tool, passing each output line to on_line."""
+        # Unbuffered output so segments can be parsed as soon as Whisper decodes them
+        env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+        process = subprocess.Popen(["whisper", p, "--model", "turbo", "--device", self.device,"--output_dir", output_dir],
+                                   stdout=subprocess.PIPE, text=True, encoding="utf-8", errors="replace", env=env)
+        for line in process.stdout:
+            on_line(line)
+        process.wait()
+
+    def load_model(self):
+        """Loads the Whisper model for in-process streaming, once per worker."""
+        if self.model is None:
+            import whisper
+            self.model = whisper.load_model("turbo", device=self.device)
+        return self.model
+
+    def timed_transcription(self, video_title, output_dir, media_duration, transcribe):
+        """
+        Runs transcribe(on_line) while reporting progress, then creates the Word document.
+        """
+        self.update_label.emit(f"Transcribing {video_title}...")
+        self.emit_progress(force=True, title=video_title, percent=0.0, rtf=None)
+        # Record the start time
+        start_time = time.time()
+        self.transcribe_started = time.monotonic()
+        self.rtf_baseline = None
+        on_line = lambda line: self.handle_whisper_line(line, media_duration)
+        try:
+            transcribe(on_line)
+        finally:
+            self.busy_seconds += time.monotonic() - self.transcribe_started
+            self.transcribe_started = None
+        # Record the end time
+        end_time = time.time()
+        self.emit_progress(force=True, percent=100.0)
+        # Calculate the duration
+        duration = end_time - start_time
+        # Create a Word file using the word_routine function
+        self.word_routine(video_title, duration, output_dir)
+
+    def transcribe_file(self, p):
+        p = Path(p)
+        # Get the video title
+        video_title = os.path.splitext(os.path.basename(p))[0]
+        output_dir = create_transcription_directory(p)
+
+        def transcribe(on_line):
+            try:
+                # Use the warm model of the transcription daemon if one is running
+                transcription_daemon.transcribe(p, output_dir, on_line=on_line)
+            except transcription_daemon.FALLBACK_ERRORS as e:
+                # Errors reported by a running daemon fail the file instead, so a second
+                # model is never loaded next to the daemon's
+                if not isinstance(e, transcription_daemon.NOT_RUNNING_ERRORS):
+                    print(f"Transcription daemon failed, transcribing in-process: {e}")
+                self.run_whisper(p, output_dir, on_line)
+
+        self.timed_transcription(video_title, output_dir, probe_duration(p), transcribe)
+
+    def stream_file(self, video_url, video_folder, entry):
+        """Transcribes a remote video while it downloads, keeping the media only if keepMedia is set."""
+        # Named like the downloaded file in download mode, so both modes share a transcription folder
+        video_title = media_title(entry)
+        output_dir = create_transcription_directory(os.path.join(video_folder, video_title))
+        media_folder = video_folder if self.keepMedia else None
+
+        def transcribe(on_line):
+            try:
+                transcription_daemon.stream(video_url, output_dir, video_title, media_folder,
+                                            on_line=on_line, on_bytes=self.bytes_hook)
+            except transcription_daemon.FALLBACK_ERRORS as e:
+                # Errors reported by a running daemon fail the entry instead, so a second
+                # model is never loaded next to the daemon's and the source is not fetched twice
+                if not isinstance(e, transcription_daemon.NOT_RUNNING_ERRORS):
+                    print(f"Transcription daemon failed, streaming in-process: {e}")
+                self.bytes_sample = None
+                stream_transcribe(self.load_model(), video_url, output_dir, video_title,
+                                  media_folder=media_folder, on_line=on_line, on_bytes=self.bytes_hook)
+
+        self.bytes_sample = None
+        self.timed_transcription(video_title, output_dir, entry.get('duration'), transcribe)
+        self.emit_progress(force=True, download_speed=0.0)
+
+    def stream_routine(self):
+        """Streams every queued URL through transcription without downloading it first."""
+        def stream_url(url):
+            try:
+                self.update_label.emit(f"Streaming {url}...")
+                for video_url, video_folder, entry in iter_entries(url, self.output_folder, self.entry_hook):
+                    try:
+                        self.stream_file(video_url, video_folder, entry)
+                    except Exception as e:
+                        # A single broken entry should not abort the rest of the playlist
+                        print(f"Failed to stream {video_url}: {e}")
+                self.url_list.remove(url)  # Remove URL after processing
+            except Exception as e:
+                print(f"Failed to stream media from {url}: {e}")
+
+        self.url_routine(stream_url)
+
+    def transcribe_routine(self, file_list):
+        self.pending_local = len(file_list)
+        for f in file_list:
+            self.pending_local -= 1
+            try:
+                self.transcribe_file(f)
+            except Exception as e:
+                print(f"Failed to transcribe {f}: {e}")
+
+    def __init__(self, url_list, local_list, output_folder, mode, noNewLine, useDaemon=False,
+                 stream=False, keepMedia=False):
         """ Mode = 1 Sadece indir
             Mode = 0 Transkript
 
             noNewLine = True or False
+            useDaemon = True starts the warm transcription daemon if it is not running
+            stream = True transcribes URLs while they download instead of saving them first
+            keepMedia = True keeps the streamed media on disk
         """
         super().__init__()
         self.url_list = url_list
@@ -142,20 +363,48 @@ class WorkerThread(QThread):
         self.output_folder = output_folder
         self.mode = mode
         self.noNewLine = noNewLine
+        self.useDaemon = useDaemon
+        self.stream = stream
+        self.keepMedia = keepMedia
         self.device = None
+        self.model = None
+
+        # Progress bookkeeping
+        self.stats = {'title': None, 'percent': 0.0, 'rtf': None, 'download_speed': 0.0,
+                      'queue_depth': 0, 'utilization': 0.0}
+        self.started_at = time.monotonic()
+        self.last_progress = 0.0
+        self.busy_seconds = 0.0
+        self.transcribe_started = None
+        self.pending_local = len(local_list)
+        self.pending_urls = len(url_list)
+        self.pending_entries = 0
+        self.bytes_sample = None
+        self.rtf_baseline = None
 
     def run(self):
         """Run the download and transcribe processes."""
+        self.started_at = time.monotonic()
         if len(self.url_list) == 0 and len(self.local_list) == 0:
             self.process_finished.emit()
             return
 
         if self.mode == 1:  # Download only
+            self.pending_local = 0  # Local files are only used for transcription
             if len(self.url_list) > 0:
                 self.download_routine()
         else:
-            if len(self.url_list) > 0:
-                downloaded_list = self.download_routine()
+            self.select_device()
+            if self.useDaemon:
+                self.update_label.emit("Starting transcription daemon...")
+                if not transcription_daemon.ensure_running(transcription_daemon.configured_idle_timeout()):
+                    print("Transcription daemon did not start, transcribing in-process")
+            self.transcribe_routine(self.local_list)
 
-            self.transcribe_routine()
+            if len(self.url_list) > 0:
+                if self.stream:
+                    self.stream_routine()
+                else:
+                    # Downloaded files are transcribed one by one while the rest of the playlist is still being fetched
+                    self.download_routine(on_downloaded=self.transcribe_file)
         self.process_finished.emit()
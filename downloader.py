@@ -4,6 +4,7 @@ import re
 from pathlib import Path
 
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import sanitize_filename
 
 def sanitize_title(title):
     """
@@ -15,98 +16,151 @@ def sanitize_title(title):
     sanitized = re.sub(r'\s+', '_', sanitized)
     return sanitized.strip('_')
 
-def download_media(url, output_folder=Path("./output"), download_format=None):
+def media_title(info_dict):
     """
-    Downloads media from the given URL using yt-dlp with restricted filenames.
+    Returns the file name stem download mode gives the media ('%(title)s' with restricted
+    filenames), so stream mode names its output the same way.
+    """
+    return sanitize_filename(info_dict.get('title') or 'NA', restricted=True)
 
-    Args:
-        url (str): The URL of the media or playlist to download.
-        output_folder (str): The directory to save the downloaded files.
-        download_format (str, optional): Specify the format (e.g., 'best', 'bestaudio', 'bestvideo'). Defaults to 'best'.
 
-    Returns:
-        list: List of full paths to the downloaded files.
+def resolve_info(ydl, info_dict):
+    """
+    Follows url results (flat playlist entries, redirects) until a video or playlist
+    info dict is reached. Playlists keep their entries as a lazy generator.
+    """
+    while info_dict.get('_type') in ('url', 'url_transparent'):
+        info_dict = ydl.extract_info(info_dict['url'], download=False, process=False)
+    return info_dict
+
+
+def iter_videos(ydl, info_dict, parent_folder, entry_hook=None, remaining=0):
+    """
+    Yields (video_url, video_folder, info) for every video below info_dict, recursing
+    into nested playlists such as the Videos/Shorts/Live tabs of a channel.
+
+    entry_hook is called before every video with the number of videos still queued after
+    it in the innermost playlist, or None while that number is unknown.
+    """
+    info_dict = resolve_info(ydl, info_dict)
+
+    if info_dict.get('_type') in ('playlist', 'multi_video') or 'entries' in info_dict:
+        # It's a playlist, nested playlists get a subfolder of their parent
+        playlist_title = info_dict.get('title') or info_dict.get('id') or 'playlist'
+        playlist_folder = os.path.join(parent_folder, sanitize_title(playlist_title))
+        os.makedirs(playlist_folder, exist_ok=True)
+
+        # Lazy listings only know their length if the site reports it up front
+        playlist_count = info_dict.get('playlist_count')
+        for index, entry in enumerate(info_dict['entries']):
+            if entry is None:
+                continue  # Skip if entry is None
+            entry_remaining = playlist_count - index - 1 if playlist_count is not None else None
+            try:
+                yield from iter_videos(ydl, entry, playlist_folder, entry_hook, entry_remaining)
+            except Exception as e:
+                # A single broken entry should not abort the rest of the playlist
+                print(f"Error resolving {entry.get('url') or entry.get('id')}: {e}", file=sys.stderr)
+
+    else:
+        # It's a single video
+        video_title = info_dict.get('title') or info_dict.get('id') or 'video'
+        video_folder = os.path.join(parent_folder, sanitize_title(video_title))
+        os.makedirs(video_folder, exist_ok=True)
+        if entry_hook is not None:
+            entry_hook(remaining)
+        yield info_dict.get('webpage_url') or info_dict.get('url'), video_folder, info_dict
+
+
+def iter_entries(url, output_folder=Path("./output"), entry_hook=None):
+    """
+    Lazily resolves the given URL into the individual videos it refers to.
+
+    Playlists and channels are listed without processing their entries, and each entry
+    is only resolved when it is reached, so the first video is yielded as soon as it is
+    known instead of after the whole listing has been resolved. Memory use stays bounded
+    no matter how long the playlist is.
+
+    Args:
+        url (str): The URL of the media or playlist.
+        output_folder (str): The directory the per-video folders are created in.
+        entry_hook (callable, optional): Called before every video with the number of videos
+            still queued after it, or None while that number is unknown.
+
+    Yields:
+        tuple: (video_url, video_folder, info) for every video, where info is the
+        unprocessed info dict returned by yt-dlp.
     """
     output_folder = Path(output_folder)
-    # Create the output folder if it doesn't exist
-    if not os.path.isdir(output_folder):
-        os.makedirs(output_folder, exist_ok=True)
 
     # Temporary options to extract info without downloading
     ydl_temp_opts = {
         'quiet': True,
         'no_warnings': True,
         'skip_download': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
     }
 
     with YoutubeDL(ydl_temp_opts) as ydl:
-        try:
-            # Extract info to get playlist or video title
-            info_dict = ydl.extract_info(url, download=False)
-            if 'entries' in info_dict:
-                # It's a playlist
-                playlist_title = info_dict.get('title', 'playlist')
-                sanitized_playlist_title = sanitize_title(playlist_title)
-                # Create a folder with the sanitized playlist title
-                playlist_folder = os.path.join(output_folder, sanitized_playlist_title)
-                if not os.path.isdir(playlist_folder):
-                    os.makedirs(playlist_folder, exist_ok=True)
-
-                # Process each video in the playlist
-                downloaded_files = []
-                for entry in info_dict['entries']:
-                    if entry is None:
-                        continue  # Skip if entry is None
-                    video_title = entry.get('title', 'video')
-                    sanitized_video_title = sanitize_title(video_title)
-                    video_folder = os.path.join(playlist_folder, sanitized_video_title)
-                    if not os.path.isdir(video_folder):
-                        os.makedirs(video_folder, exist_ok=True)
-
-                    # Set download options for each video
-                    ydl_opts = {
-                        'restrict_filenames': True,
-                        'outtmpl': os.path.join(video_folder, '%(title)s.%(ext)s'),
-                        'format': download_format if download_format else 'best',
-                        'quiet': True,
-                        'no_warnings': True,
-                        'skip_download': False,
-                    }
-
-                    with YoutubeDL(ydl_opts) as ydl_video:
-                        # Download the video
-                        video_info = ydl_video.extract_info(entry['webpage_url'], download=True)
-                        filename = ydl_video.prepare_filename(video_info)
-                        full_path = os.path.abspath(filename)
-                        downloaded_files.append(full_path)
-
-                return downloaded_files
-
-            else:
-                # It's a single video
-                video_title = info_dict.get('title', 'video')
-                sanitized_video_title = sanitize_title(video_title)
-                video_folder = os.path.join(output_folder, sanitized_video_title)
-                if not os.path.isdir(video_folder):
-                    os.makedirs(video_folder, exist_ok=True)
-
-                # Set download options
-                ydl_opts = {
-                    'restrict_filenames': True,
-                    'outtmpl': os.path.join(video_folder, '%(title)s.%(ext)s'),
-                    'format': download_format if download_format else 'best',
-                    'quiet': True,
-                    'no_warnings': True,
-                }
-
-                with YoutubeDL(ydl_opts) as ydl_video:
-                    # Download the video
-                    video_info = ydl_video.extract_info(url, download=True)
-                    filename = ydl_video.prepare_filename(video_info)
-                    full_path = os.path.abspath(filename)
-
-                    return [full_path]
+        # process=False keeps playlist entries as a lazy generator
+        info_dict = ydl.extract_info(url, download=False, process=False)
+        yield from iter_videos(ydl, info_dict, output_folder, entry_hook)
+
+
+def iter_media(url, output_folder=Path("./output"), download_format=None, progress_hook=None, entry_hook=None):
+    """
+    Downloads media from the given URL, yielding each file as soon as it is on disk.
 
+    Args:
+        url (str): The URL of the media or playlist to download.
+        output_folder (str): The directory to save the downloaded files.
+        download_format (str, optional): Specify the format (e.g., 'best', 'bestaudio', 'bestvideo'). Defaults to 'best'.
+        progress_hook (callable, optional): yt-dlp progress hook called with download status dicts.
+        entry_hook (callable, optional): See iter_entries().
+
+    Yields:
+        str: Full path to each downloaded file.
+    """
+    output_folder = Path(output_folder)
+    # Create the output folder if it doesn't exist
+    os.makedirs(output_folder, exist_ok=True)
+
+    for video_url, video_folder, info in iter_entries(url, output_folder, entry_hook):
+        # Set download options for each video
+        ydl_opts = {
+            'restrict_filenames': True,
+            'outtmpl': os.path.join(video_folder, '%(title)s.%(ext)s'),
+            'format': download_format if download_format else 'best',
+            'quiet': True,
+            'no_warnings': True,
+        }
+        if progress_hook is not None:
+            ydl_opts['progress_hooks'] = [progress_hook]
+
+        try:
+            with YoutubeDL(ydl_opts) as ydl_video:
+                # Download the video from the already resolved info instead of extracting it again
+                video_info = ydl_video.process_ie_result(info, download=True)
+                filename = ydl_video.prepare_filename(video_info)
         except Exception as e:
-            print(f"Error processing media: {e}", file=sys.stderr)
-            sys.exit(1)
\ No newline at end of file
+            # A single broken entry should not abort the rest of the playlist
+            print(f"Error downloading {video_url}: {e}", file=sys.stderr)
+            continue
+
+        yield os.path.abspath(filename)
+
+
+def download_media(url, output_folder=Path("./output"), download_format=None):
+    """
+    Downloads media from the given URL using yt-dlp with restricted filenames.
+
+    Args:
+        url (str): The URL of the media or playlist to download.
+        output_folder (str): The directory to save the downloaded files.
+        download_format (str, optional): Specify the format (e.g., 'best', 'bestaudio', 'bestvideo'). Defaults to 'best'.
+
+    Returns:
+        list: List of full paths to the downloaded files.
+    """
+    return list(iter_media(url, output_folder, download_format))
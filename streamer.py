@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import urllib.parse
+import queue
+import contextlib
+import shutil
+import threading
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Seconds of audio collected before each transcription pass
+WINDOW_SECONDS = 30
+# Bytes read from the decoder at a time (one second of 16-bit mono audio)
+CHUNK_BYTES = SAMPLE_RATE * 2
+# Minimum number of seconds between two reports of the bytes received
+BYTES_INTERVAL = 0.5
+# Windows of decoded audio buffered ahead of transcription before the download is paused
+QUEUED_WINDOWS = 3
+# Format of the kept media, the same as download mode
+KEEP_FORMAT = 'best'
+# Format streamed when the media is not kept
+STREAM_FORMAT = 'bestaudio/best'
+
+
+def check_url(url):
+    """Raises ValueError unless url is an http(s) URL."""
+    if urllib.parse.urlparse(url).scheme not in ('http', 'https'):
+        raise ValueError(f"Not an http(s) URL: {url}")
+
+
+def resolve_media(url, media_folder, download_format):
+    """
+    Picks the format and file name the media would get in download mode.
+
+    Returns:
+        tuple: (format_id, filename). The format id pins the yt-dlp subprocess to the same format.
+    """
+    from yt_dlp import YoutubeDL
+
+    ydl_opts = {
+        'restrict_filenames': True,
+        'outtmpl': os.path.join(media_folder, '%(title)s.%(ext)s'),
+        'format': download_format,
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        return info['format_id'], os.path.abspath(ydl.prepare_filename(info))
+
+
+def copy_stream(source, sink, media_file=None, on_bytes=None):
+    """
+    Copies the raw download to the decoder, keeping a copy of it in media_file if given.
+    on_bytes is called with the total number of bytes received so far.
+    """
+    total = 0
+    last_report = 0.0
+    try:
+        for chunk in iter(lambda: source.read1(64 * 1024), b''):
+            if media_file is not None:
+                media_file.write(chunk)
+            sink.write(chunk)
+            total += len(chunk)
+            now = time.monotonic()
+            if on_bytes is not None and now - last_report >= BYTES_INTERVAL:
+                last_report = now
+                on_bytes(total)
+    except BrokenPipeError:
+        pass  # Decoder exited early, its return code is checked by the caller
+    finally:
+        if media_file is not None:
+            media_file.close()
+        sink.close()
+        source.close()
+        if on_bytes is not None:
+            on_bytes(total)
+
+
+def read_chunks(stream, chunks):
+    """
+    Moves decoded audio into the chunks queue so the transfer does not wait for every
+    transcription pass. The queue is bounded, so a fast download is paused instead of
+    piling up in memory.
+    """
+    for chunk in iter(lambda: stream.read(CHUNK_BYTES), b''):
+        chunks.put(chunk)
+    chunks.put(None)
+
+
+def open_audio_stream(url, media_folder=None, on_bytes=None):
+    """
+    Starts piping the media at url through ffmpeg, which decodes it to 16 kHz mono PCM.
+
+    Args:
+        url (str): The http(s) URL of a single video.
+        media_folder (str, optional): Folder to keep the original media in, with the format
+            and file name download mode would use. Nothing is written to disk if omitted,
+            and only the best audio-only format is transferred.
+        on_bytes (callable, optional): Called with the total number of bytes received so far.
+
+    Returns:
+        tuple: (downloader, decoder, pump, media_file) where decoder.stdout yields the PCM data,
+        pump is the thread copying the download and media_file is the path of the kept media or None.
+    """
+    check_url(url)
+
+    media_file = None
+    download_format = STREAM_FORMAT
+    if media_folder is not None:
+        download_format, media_file = resolve_media(url, media_folder, KEEP_FORMAT)
+
+    # "--" so that a URL can never be parsed as a yt-dlp option
+    downloader = subprocess.Popen(
+        [sys.executable, "-m", "yt_dlp", "--quiet", "--no-warnings", "--no-part",
+         "-f", download_format, "-o", "-", "--", url],
+        stdout=subprocess.PIPE)
+
+    decoder_cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+                   "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+
+    # The download goes through this process so its throughput can be measured
+    decoder = subprocess.Popen(decoder_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    pump = threading.Thread(target=copy_stream,
+                            args=(downloader.stdout, decoder.stdin,
+                                  open(media_file, 'wb') if media_file else None, on_bytes),
+                            daemon=True)
+    pump.start()
+    return downloader, decoder, pump, media_file
+
+
+def stream_transcribe(model, url, output_dir, title, media_folder=None, on_line=None, on_bytes=None,
+                      window_seconds=WINDOW_SECONDS):
+    """
+    Transcribes remote media while it is still being downloaded.
+
+    Audio is decoded as it arrives and transcribed window by window. The last segment
+    of every window may be cut off, so its audio is carried over into the next window.
+    Segment lines are reported in the same format as Whisper's verbose output.
+
+    Args:
+        model: A loaded Whisper model.
+        url (str): The http(s) URL of a single video.
+        output_dir (str): The directory the transcription files are written to.
+        title (str): Base name of the transcription files.
+        media_folder (str, optional): Folder to keep the original media in. A partial file
+            is removed if streaming fails.
+        on_line (callable, optional): Called with every segment line.
+        on_bytes (callable, optional): Called from a background thread with the total number
+            of bytes downloaded so far.
+        window_seconds (int): Seconds of audio collected before each transcription pass.
+
+    Returns:
+        dict: The Whisper result with the segments of all windows.
+    """
+    from whisper.utils import format_timestamp, get_writer
+
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is required for streaming transcription")
+
+    downloader, decoder, pump, media_file = open_audio_stream(url, media_folder, on_bytes=on_bytes)
+
+    segments = []
+    language = None
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0.0  # Position of the buffer start in the stream, in seconds
+
+    def transcribe_window(final):
+        nonlocal buffer, offset, language
+        prompt = "".join(segment['text'] for segment in segments[-5:]) or None
+        result = model.transcribe(buffer, language=language, initial_prompt=prompt, verbose=None)
+        language = language or result.get('language')
+
+        window_segments = result['segments']
+        if not final and len(window_segments) > 1:
+            # Keep the possibly incomplete last segment for the next window
+            window_segments = window_segments[:-1]
+            cut = window_segments[-1]['end']
+        else:
+            cut = len(buffer) / SAMPLE_RATE
+
+        for segment in window_segments:
+            segment = dict(segment, id=len(segments),
+                           start=segment['start'] + offset, end=segment['end'] + offset)
+            segments.append(segment)
+            if on_line is not None:
+                on_line(f"[{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}] "
+                        f"{segment['text'].strip()}\n")
+
+        buffer = buffer[int(cut * SAMPLE_RATE):]
+        offset += cut
+
+    # Every chunk is one second of audio
+    chunks = queue.Queue(maxsize=QUEUED_WINDOWS * window_seconds)
+    reader = threading.Thread(target=read_chunks, args=(decoder.stdout, chunks), daemon=True)
+    reader.start()
+
+    try:
+        try:
+            for chunk in iter(chunks.get, None):
+                samples = np.frombuffer(chunk[:len(chunk) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+                buffer = np.concatenate([buffer, samples])
+                if len(buffer) >= window_seconds * SAMPLE_RATE:
+                    transcribe_window(final=False)
+            if len(buffer) > 0:
+                transcribe_window(final=True)
+        except BaseException:
+            downloader.kill()
+            decoder.kill()
+            # Unblock the reader thread so it can see the end of the stream and exit
+            while reader.is_alive():
+                with contextlib.suppress(queue.Empty):
+                    chunks.get(timeout=0.1)
+            raise
+        finally:
+            decoder.wait()
+            downloader.wait()
+            pump.join()
+
+        if downloader.returncode != 0 or decoder.returncode != 0:
+            raise RuntimeError(f"Streaming {url} failed (yt-dlp exit code {downloader.returncode}, "
+                               f"ffmpeg exit code {decoder.returncode})")
+    except BaseException:
+        if media_file is not None and os.path.exists(media_file):
+            os.remove(media_file)  # Do not leave a partial download behind
+        raise
+
+    result = {
+        'text': "".join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': language,
+    }
+    # Same output files as the whisper command line tool
+    writer = get_writer("all", output_dir)
+    writer(result, media_file or os.path.join(output_dir, title),
+           {"max_line_width": None, "max_line_count": None, "highlight_words": False})
+    return result
@@ -0,0 +1,363 @@
+import os
+import sys
+import io
+import json
+import time
+import socket
+import argparse
+import threading
+import contextlib
+import subprocess
+
+MODEL_NAME = "turbo"
+# Seconds without any request before the daemon exits and frees the model,
+# can be overridden with the ARCHIVISM_DAEMON_IDLE_TIMEOUT environment variable
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+# Seconds to wait for a freshly started daemon to load the model
+DEFAULT_STARTUP_TIMEOUT = 5 * 60
+# Errors meaning no daemon is listening, as opposed to a daemon that failed
+NOT_RUNNING_ERRORS = (FileNotFoundError, ConnectionRefusedError)
+# Errors after which no work was done by the daemon, so it can safely be redone in-process.
+# ConnectionAbortedError is raised when the connection is lost before any reply arrived.
+FALLBACK_ERRORS = NOT_RUNNING_ERRORS + (ConnectionAbortedError,)
+
+
+def configured_idle_timeout():
+    """Returns the idle timeout from ARCHIVISM_DAEMON_IDLE_TIMEOUT, or the default."""
+    value = os.environ.get("ARCHIVISM_DAEMON_IDLE_TIMEOUT")
+    if not value:
+        return DEFAULT_IDLE_TIMEOUT
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Invalid ARCHIVISM_DAEMON_IDLE_TIMEOUT {value!r}, using {DEFAULT_IDLE_TIMEOUT}", file=sys.stderr)
+        return DEFAULT_IDLE_TIMEOUT
+
+
+def socket_path():
+    """
+    Returns the path of the daemon socket. By default it lives in a directory only the current
+    user can access, which the daemon creates, so no other user can make the daemon read or
+    write files on their behalf.
+    """
+    if os.environ.get("ARCHIVISM_DAEMON_SOCKET"):
+        return os.environ["ARCHIVISM_DAEMON_SOCKET"]
+    base_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.expanduser("~")
+    return os.path.join(base_dir, ".archivism", "daemon.sock")
+
+
+class DaemonError(Exception):
+    """Raised when the daemon reports a failure or the connection is lost."""
+
+
+def send_message(wfile, message):
+    """Writes a single JSON message followed by a newline and flushes it."""
+    wfile.write(json.dumps(message) + "\n")
+    wfile.flush()
+
+
+class LineSender(io.TextIOBase):
+    """
+    File-like object that forwards everything printed to it to the client, one line per message.
+    Used to relay Whisper's verbose segment output while it is being produced.
+    """
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            send_message(self.wfile, {"line": line})
+        return len(text)
+
+
+def handle_request(model, model_lock, device, request, wfile):
+    """
+    Handles a single client request. The model is used by one request at a time.
+    """
+    cmd = request.get("cmd")
+    if cmd == "ping":
+        send_message(wfile, {"device": device})
+    elif cmd == "transcribe":
+        from whisper.utils import get_writer
+
+        path = request["path"]
+        output_dir = request["output_dir"]
+        with model_lock, contextlib.redirect_stdout(LineSender(wfile)):
+            result = model.transcribe(path, verbose=True)
+        # Same output files as the whisper command line tool
+        writer = get_writer("all", output_dir)
+        writer(result, path, {"max_line_width": None, "max_line_count": None, "highlight_words": False})
+        send_message(wfile, {"done": True, "device": device})
+    elif cmd == "stream":
+        from streamer import check_url, stream_transcribe
+
+        check_url(request["url"])
+
+        # Byte counts are reported from the download thread, so writes must not interleave
+        lock = threading.Lock()
+
+        def send(message):
+            with lock:
+                send_message(wfile, message)
+
+        def send_bytes(total):
+            with contextlib.suppress(OSError):
+                send({"bytes": total})
+
+        with model_lock:
+            stream_transcribe(model, request["url"], request["output_dir"], request["title"],
+                              media_folder=request.get("media_folder"),
+                              on_line=lambda line: send({"line": line.rstrip("\n")}),
+                              on_bytes=send_bytes)
+        send_message(wfile, {"done": True, "device": device})
+    else:
+        send_message(wfile, {"error": f"Unknown command: {cmd}"})
+
+
+class Daemon:
+    """Keeps the Whisper model loaded and serves requests until it has been idle for too long."""
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.model = None
+        self.model_lock = threading.Lock()
+        self.device = None
+        self.state_lock = threading.Lock()
+        self.active = 0
+        self.last_activity = time.monotonic()
+        self.shutdown = False
+
+    def handle_connection(self, conn):
+        with conn:
+            rfile = conn.makefile('r', encoding='utf-8')
+            wfile = conn.makefile('w', encoding='utf-8')
+            try:
+                request = json.loads(rfile.readline())
+                if not isinstance(request, dict):
+                    raise ValueError("request is not a JSON object")
+            except (OSError, ValueError) as e:
+                print(f"Invalid request: {e}", file=sys.stderr)
+                return
+
+            if request.get("cmd") == "shutdown":
+                self.shutdown = True
+                with contextlib.suppress(OSError):
+                    send_message(wfile, {"done": True})
+                return
+
+            try:
+                handle_request(self.model, self.model_lock, self.device, request, wfile)
+            except Exception as e:
+                print(f"Request failed: {e}", file=sys.stderr)
+                with contextlib.suppress(OSError):
+                    send_message(wfile, {"error": str(e)})
+
+    def run_connection(self, conn):
+        try:
+            self.handle_connection(conn)
+        finally:
+            with self.state_lock:
+                self.active -= 1
+                self.last_activity = time.monotonic()
+
+    def serve(self):
+        path = socket_path()
+        socket_dir = os.path.dirname(path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        if not os.environ.get("ARCHIVISM_DAEMON_SOCKET"):
+            os.chmod(socket_dir, 0o700)
+        if os.path.exists(path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(path)
+                print("A transcription daemon is already running", file=sys.stderr)
+                return
+            except NOT_RUNNING_ERRORS:
+                os.unlink(path)  # Left over from a daemon that did not exit cleanly
+
+        # Bind before loading the model so clients can connect and wait instead of starting their own
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            os.chmod(path, 0o600)
+            server.listen()
+            try:
+                import torch
+                import whisper
+
+                self.device = "cuda" if torch.cuda.is_available() else "cpu"
+                self.model = whisper.load_model(MODEL_NAME, device=self.device)
+                print(f"Transcription daemon listening on {path} ({self.device})", file=sys.stderr)
+
+                self.last_activity = time.monotonic()
+                # Poll so idle time is measured from the end of the last request
+                server.settimeout(1.0)
+                while not self.shutdown:
+                    with self.state_lock:
+                        if self.active == 0 and time.monotonic() - self.last_activity >= self.idle_timeout:
+                            print("Idle timeout reached, shutting down", file=sys.stderr)
+                            break
+                    try:
+                        conn, _ = server.accept()
+                    except socket.timeout:
+                        continue
+                    conn.settimeout(None)
+                    with self.state_lock:
+                        self.active += 1
+                    # Pings are answered while another request holds the model
+                    threading.Thread(target=self.run_connection, args=(conn,), daemon=True).start()
+            finally:
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
+
+
+def serve(idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """
+    Keeps the Whisper model loaded and serves transcription requests on a local socket
+    until no request has arrived for idle_timeout seconds.
+    """
+    Daemon(idle_timeout).serve()
+
+
+def request(message, on_line=None, on_bytes=None, timeout=None):
+    """
+    Sends a request to the daemon and waits for its final reply.
+
+    Args:
+        message (dict): The request to send.
+        on_line (callable, optional): Called with every output line relayed by the daemon.
+        on_bytes (callable, optional): Called with the byte counts relayed by the daemon.
+        timeout (float, optional): Seconds to wait for each reply. Waits forever if omitted.
+
+    Returns:
+        dict: The final reply of the daemon.
+
+    Raises:
+        OSError: One of NOT_RUNNING_ERRORS if the daemon is not running, or
+            ConnectionAbortedError if the connection was lost or timed out before any reply.
+        DaemonError: If the daemon reports an error, replies with something that is not
+            a daemon message or the connection is lost after work has started.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise ConnectionRefusedError("The transcription daemon is not supported on this platform")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(socket_path())
+        received = False
+        try:
+            rfile = conn.makefile('r', encoding='utf-8')
+            wfile = conn.makefile('w', encoding='utf-8')
+            send_message(wfile, message)
+            for raw in rfile:
+                received = True
+                try:
+                    reply = json.loads(raw)
+                except ValueError as e:
+                    raise DaemonError(f"Malformed reply from the transcription daemon: {e}")
+                if not isinstance(reply, dict):
+                    raise DaemonError("Malformed reply from the transcription daemon")
+                if "line" in reply:
+                    if on_line is not None:
+                        on_line(reply["line"] + "\n")
+                elif "bytes" in reply:
+                    if on_bytes is not None:
+                        on_bytes(reply["bytes"])
+                elif "error" in reply:
+                    raise DaemonError(reply["error"])
+                else:
+                    return reply
+        except OSError as e:
+            if received:
+                raise DaemonError(f"Lost connection to the transcription daemon: {e}")
+            raise ConnectionAbortedError(f"Lost connection to the transcription daemon: {e}") from e
+    if received:
+        raise DaemonError("Connection to the transcription daemon was closed")
+    raise ConnectionAbortedError("Connection to the transcription daemon was closed")
+
+
+def ping(timeout=1.0):
+    """
+    Returns the device of the running daemon.
+
+    Raises:
+        OSError, DaemonError: See request(). A reply without a device is a DaemonError.
+    """
+    reply = request({"cmd": "ping"}, timeout=timeout)
+    if "device" not in reply:
+        raise DaemonError("Unexpected reply to ping")
+    return reply["device"]
+
+
+def is_running():
+    """Returns True if a daemon answers pings."""
+    try:
+        ping()
+        return True
+    except (OSError, DaemonError):
+        return False
+
+
+def transcribe(path, output_dir, on_line=None):
+    """Transcribes a media file with the daemon. See request() for the errors raised."""
+    return request({"cmd": "transcribe", "path": str(path), "output_dir": str(output_dir)}, on_line=on_line)
+
+
+def stream(url, output_dir, title, media_folder=None, on_line=None, on_bytes=None):
+    """Transcribes remote media with the daemon while it downloads. See request() for the errors raised."""
+    return request({"cmd": "stream", "url": url, "output_dir": str(output_dir), "title": title,
+                    "media_folder": media_folder}, on_line=on_line, on_bytes=on_bytes)
+
+
+def ensure_running(idle_timeout=None, startup_timeout=DEFAULT_STARTUP_TIMEOUT):
+    """
+    Starts the daemon in its own session, so it outlives the GUI, unless it is already running,
+    and waits until it has loaded the model.
+
+    Args:
+        idle_timeout (float, optional): Idle timeout of a started daemon. Defaults to
+            configured_idle_timeout().
+        startup_timeout (float): Seconds to wait for the daemon to load the model.
+
+    Returns:
+        bool: True if the daemon answers pings.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    if idle_timeout is None:
+        idle_timeout = configured_idle_timeout()
+
+    process = None
+    try:
+        ping()
+        return True
+    except NOT_RUNNING_ERRORS:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--idle-timeout", str(idle_timeout)],
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+    except (OSError, DaemonError):
+        pass  # Listening but still loading the model, or not a daemon at all
+
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        try:
+            ping(timeout=max(deadline - time.monotonic(), 0.1))
+            return True
+        except NOT_RUNNING_ERRORS:
+            if process is not None and process.poll() is not None:
+                return False  # The daemon exited before it could listen
+            time.sleep(0.2)  # Socket not bound yet
+        except (OSError, DaemonError):
+            return False
+    return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Archivism background transcription daemon")
+    parser.add_argument("--idle-timeout", type=float, default=configured_idle_timeout(),
+                        help="Seconds without requests before the daemon exits "
+                             "(default: $ARCHIVISM_DAEMON_IDLE_TIMEOUT or %(default)s)")
+    args = parser.parse_args()
+    serve(args.idle_timeout)